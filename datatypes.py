@@ -18,7 +18,7 @@
 # 
 
 from byteform import *
-import types
+import array, struct, sys
 
 """ This module contains classes for handling the 12 different data types in
     TIFF/Exif data. Each class provides an encode method and a decode method, to
@@ -26,6 +26,154 @@ import types
     stream into a data stream. 
     The TYPES dict matches each data type number to the proper class. """
     
+# The Python types which are accepted as a single number to encode
+NUMERIC_TYPES = (int, long, float)
+
+# The compiled struct.Struct objects, by byte order, format character and count.
+# Since the count is part of the key, the cache is emptied when it gets large.
+STRUCT_CACHE = {}
+STRUCT_CACHE_SIZE = 256
+
+def __getByteOrderChar__(big_endian):
+  """ Return the struct control character for the specified byte order. """
+  
+  if (big_endian):
+    return ">"
+  else:
+    return "<"
+    
+def __getStruct__(big_endian, struct_code, count):
+  """ Return a struct.Struct for count numbers of the specified struct format
+      character, so the format string only needs to be parsed once. """
+  
+  key = (big_endian, struct_code, count)
+  packer = STRUCT_CACHE.get(key)
+  if (packer == None):
+    if (len(STRUCT_CACHE) >= STRUCT_CACHE_SIZE):
+      STRUCT_CACHE.clear()
+    packer = struct.Struct("%s%d%s" % (__getByteOrderChar__(big_endian), count, struct_code))
+    STRUCT_CACHE[key] = packer
+    
+  return packer
+  
+def __makeCoders__(cls):
+  """ Construct the encode and decode class methods for the specified data
+      type class. The parameters of the class are bound in, so they don't need
+      to be looked up or checked on each call. """
+  
+  width       = cls.word_width
+  struct_code = cls.struct_code
+  
+  if (struct_code):
+    # Let the struct module (un)pack all the numbers at once. The packers for
+    # a single number are used most, so we keep them at hand.
+    big_packer    = __getStruct__(True, struct_code, 1)
+    little_packer = __getStruct__(False, struct_code, 1)
+    
+    def encode(cls, stream, is_big_endian = True):
+      # A single number can be packed directly
+      if (isinstance(stream, NUMERIC_TYPES)):
+        if (is_big_endian):
+          return big_packer.pack(stream)
+        else:
+          return little_packer.pack(stream)
+      # Numbers which are already in an array can be converted as a whole
+      if (isinstance(stream, array.array)):
+        return cls.encode_array(stream, is_big_endian)
+      # We need to know the number of words up front, so turn other iterables
+      # into a tuple
+      if (not isinstance(stream, (list, tuple))):
+        stream = tuple(stream)
+      return __getStruct__(is_big_endian, struct_code, len(stream)).pack(*stream)
+      
+    def decode(cls, byte_str, is_big_endian = True):
+      num_bytes = len(byte_str)
+      if (num_bytes == width):
+        if (is_big_endian):
+          return list(big_packer.unpack(byte_str))
+        else:
+          return list(little_packer.unpack(byte_str))
+      if ((num_bytes % width) != 0):
+        raise ValueError("The number of bytes for decoding does not match the specified word width!")
+      return list(__getStruct__(is_big_endian, struct_code, num_bytes / width).unpack(byte_str))
+      
+  else:
+    # Encode and decode each word separately. The signed parameter is only
+    # passed to the word coders if we deal with possibly signed numbers, so
+    # each case gets its own functions with a plain call inside the loop.
+    word_encoder = getattr(cls, "word_encoder", None)
+    word_decoder = getattr(cls, "word_decoder", None)
+    signed       = getattr(cls, "signed", None)
+    
+    if (signed != None):
+      def encode(cls, stream, is_big_endian = True):
+        # A single number can be encoded directly
+        if (isinstance(stream, NUMERIC_TYPES)):
+          return word_encoder(stream, width, signed, is_big_endian)
+        # Append each encoded word to the buffer. A bytearray grows in place,
+        # which is a lot cheaper than growing a string.
+        encoded_str = bytearray()
+        extend      = encoded_str.extend
+        for word in stream:
+          extend(word_encoder(word, width, signed, is_big_endian))
+        return str(encoded_str)
+        
+      def decode(cls, byte_str, is_big_endian = True):
+        num_bytes = len(byte_str)
+        if ((num_bytes % width) != 0):
+          raise ValueError("The number of bytes for decoding does not match the specified word width!")
+        return [word_decoder(byte_str[byte_num:byte_num + width], signed, is_big_endian) for byte_num in xrange(0, num_bytes, width)]
+        
+    else:
+      def encode(cls, stream, is_big_endian = True):
+        if (isinstance(stream, NUMERIC_TYPES)):
+          return word_encoder(stream, width, is_big_endian)
+        encoded_str = bytearray()
+        extend      = encoded_str.extend
+        for word in stream:
+          extend(word_encoder(word, width, is_big_endian))
+        return str(encoded_str)
+        
+      def decode(cls, byte_str, is_big_endian = True):
+        num_bytes = len(byte_str)
+        if ((num_bytes % width) != 0):
+          raise ValueError("The number of bytes for decoding does not match the specified word width!")
+        return [word_decoder(byte_str[byte_num:byte_num + width], is_big_endian) for byte_num in xrange(0, num_bytes, width)]
+      
+  # Mark the methods, so derived classes know they need their own
+  encode.is_generated = True
+  decode.is_generated = True
+  
+  return classmethod(encode), classmethod(decode)
+  
+def __isGenerated__(cls, method_name):
+  """ Return True if the class has no method with the specified name, or one
+      that was built by __makeCoders__ for a base class. """
+  
+  method = getattr(cls, method_name, None)
+  return (method == None) or getattr(method.im_func, "is_generated", False)
+  
+class DataTypeClass(type):
+  """ The metaclass for the data types. Every data type class gets encode and
+      decode methods with its own parameters bound in when it is created,
+      unless it defines these methods itself. """
+  
+  def __init__(cls, name, bases, attrs):
+    type.__init__(cls, name, bases, attrs)
+    
+    # Only classes which specify a word width can be encoded
+    if (getattr(cls, "word_width", None) == None):
+      return
+      
+    replace_encode = __isGenerated__(cls, "encode")
+    replace_decode = __isGenerated__(cls, "decode")
+    if (replace_encode) or (replace_decode):
+      encode, decode = __makeCoders__(cls)
+      if (replace_encode):
+        cls.encode = encode
+      if (replace_decode):
+        cls.decode = decode
+        
 class DataType:
   """ The base class for each data type. Derived classes should set the folowing
       parameters:
@@ -34,50 +182,60 @@ class DataType:
       - is_signed:    whether the number is signed (None if not applicable)
       - word_encoder: a method to encode a single word
       - word_decoder: a method to decode a single word
+                      (both wrapped in staticmethod, since a plain function
+                      would become an unbound method of the class)
+      - struct_code:  the format character for the struct module, if the whole
+                      stream can be (un)packed by it in one go (None if not)
+      The encode and decode methods are built for each class when it is
+      created, with these parameters bound in (see DataTypeClass).
   """
+  
+  __metaclass__ = DataTypeClass
+  
+  struct_code = None
  
   @classmethod
-  def encode(cls, stream, is_big_endian = True):
-    # We need to return a string of enoded characters
-    encoded_str = ""
-    
-    # If we got a single number as stream, encapsulate it in a list
-    if (type(stream) in [types.IntType, types.LongType, types.FloatType]):
-      stream = [stream]
-    
-    # Encode each number in the stream and append it to the buffer
-    for word in stream:
-      if (cls.signed != None):
-        # If we don't deal with possible signed numbers, don't pass that
-        # parameter as well
-        encoded_word = cls.word_encoder(word, cls.word_width, cls.signed, is_big_endian)
-      else:
-        encoded_word = cls.word_encoder(word, cls.word_width, is_big_endian)
+  def encode_array(cls, nums, is_big_endian = True):
+    """ Encode an array.array of numbers. The numbers are converted as a whole
+        buffer, without handling each number separately in Python. This is only
+        possible for data types with a struct code. """
         
-      encoded_str += encoded_word
+    if (not cls.struct_code):
+      raise TypeError("This data type can not be encoded from an array!")
+      
+    # Make sure the array holds the proper type, this also copies it so we can
+    # safely swap the bytes
+    nums = array.array(cls.struct_code, nums)
+    if (nums.itemsize != cls.word_width):
+      raise TypeError("The array type for this data type has the wrong word width on this platform!")
+      
+    # The array is stored in the machine byte order, so swap if needed
+    if (is_big_endian != (sys.byteorder == "big")):
+      nums.byteswap()
       
-    return encoded_str
+    return nums.tostring()
     
   @classmethod
-  def decode(cls, byte_str, is_big_endian = True):
-    # We need to return a list of decoded numbers
-    decoded_nums = []
+  def decode_array(cls, byte_str, is_big_endian = True):
+    """ Decode the byte stream into an array.array instead of a list. The
+        numbers stay packed in a typed buffer, which is much cheaper for large
+        streams when the caller only needs to iterate over them. This is only
+        possible for data types with a struct code. """
     
-    # Check for the proper number of bytes
-    if ((len(byte_str) % cls.word_width) != 0):
-      raise "The number of bytes for decoding does not match the specified word width!"
+    if (not cls.struct_code):
+      raise TypeError("This data type can not be decoded into an array!")
       
-    # Iterate over all word_width sized pars and decode them
-    for byte_num in range(0, len(byte_str), cls.word_width):
-      word = byte_str[byte_num:byte_num + cls.word_width]
-      if (cls.signed != None):
-        # If we don't deal with possible signed numbers, don't pass that
-        # parameter as well
-        decoded_word = cls.word_decoder(word, cls.signed, is_big_endian)
-      else:
-        decoded_word = cls.word_decoder(word, is_big_endian)
-        
-      decoded_nums.append(decoded_word)
+    # The array type codes match the struct format characters we use
+    decoded_nums = array.array(cls.struct_code)
+    if (decoded_nums.itemsize != cls.word_width):
+      raise TypeError("The array type for this data type has the wrong word width on this platform!")
+    if ((len(byte_str) % cls.word_width) != 0):
+      raise ValueError("The number of bytes for decoding does not match the specified word width!")
+    decoded_nums.fromstring(byte_str)
+    
+    # The array is filled in the machine byte order, so swap if needed
+    if (is_big_endian != (sys.byteorder == "big")):
+      decoded_nums.byteswap()
       
     return decoded_nums
   
@@ -86,6 +244,7 @@ class Byte(DataType):
   signed       = False
   word_encoder = staticmethod(itob)
   word_decoder = staticmethod(btoi)
+  struct_code  = "B"
   
 class Ascii(DataType):
   """ Encoding and decoding ASCII Data is fundamentally different from the
@@ -99,9 +258,9 @@ class Ascii(DataType):
     
     # We cannot support multiple strings, but we can encode a single string
     # inside a list
-    if (type(stream) in [types.TupleType, types.ListType]):
+    if (isinstance(stream, (tuple, list))):
       if (len(stream) > 1):
-        raise "Ascii write method does not support encoding multiple strings!"
+        raise ValueError("Ascii write method does not support encoding multiple strings!")
       else:
         stream = stream[0]
         
@@ -119,12 +278,14 @@ class Short(DataType):
   signed       = False
   word_encoder = staticmethod(itob)
   word_decoder = staticmethod(btoi)
+  struct_code  = "H"
   
 class Long(DataType):
   word_width   = 4
   signed       = False
   word_encoder = staticmethod(itob)
   word_decoder = staticmethod(btoi)
+  struct_code  = "I"
 
 class Rational(DataType):
   word_width   = 8
@@ -137,6 +298,7 @@ class SByte(DataType):
   signed       = True
   word_encoder = staticmethod(itob)
   word_decoder = staticmethod(btoi)
+  struct_code  = "b"
   
 class Undefined(DataType):
   """ The Undefined data type lets the user write arbritary bytes to the file.
@@ -146,11 +308,11 @@ class Undefined(DataType):
   
   @classmethod
   def encode(cls, byte_stream, is_big_endian = True):
-    if (type(byte_stream) in [types.ListType, types.TupleType]):
+    if (isinstance(byte_stream, (list, tuple))):
       if (len(byte_stream) == 1):
         byte_stream = byte_stream[0]
-    if (type(byte_stream) != types.StringType):
-      raise "You need to encode the data stream yourself for type UNDEFINED!"
+    if (not isinstance(byte_stream, str)):
+      raise TypeError("You need to encode the data stream yourself for type UNDEFINED!")
       
     return byte_stream
     
@@ -163,12 +325,14 @@ class SShort(DataType):
   signed       = True
   word_encoder = staticmethod(itob)
   word_decoder = staticmethod(btoi)
+  struct_code  = "h"
   
 class SLong(DataType):
   word_width   = 4
   signed       = True
   word_encoder = staticmethod(itob)
   word_decoder = staticmethod(btoi)
+  struct_code  = "i"
   
 class SRational(DataType):
   word_width   = 8
@@ -181,9 +345,11 @@ class Float(DataType):
   signed       = None
   word_encoder = staticmethod(ftob)
   word_decoder = staticmethod(btof)
+  struct_code  = "f"
 
 class Double(DataType):
   word_width   = 8
   signed       = None
   word_encoder = staticmethod(ftob)
   word_decoder = staticmethod(btof)
+  struct_code  = "d"
@@ -106,7 +106,10 @@ class Exif(metainfofile.MetaInfoBlock, datablock.DataBlock):
         loaded when it's actually needed. """
 
     # Try to load the record object
-    rec_obj = self.records.query("num", rec_num, "record")
+    index = self.__getRecordIndex__(rec_num)
+    if (index == None):
+      return False
+    rec_obj = self.records.getList("record")[index]
 
     # If it doesn't exist yet, try to load it
     if (rec_obj == None):
@@ -175,7 +178,7 @@ class Exif(metainfofile.MetaInfoBlock, datablock.DataBlock):
           rec_obj = InteropIFD(big_endian = self.big_endian)
       
       # Store the newly loaded record
-      self.records.setValue("num", rec_num, "record", rec_obj)
+      self.records.getList("record")[index] = rec_obj
 
     # Return what we found or loaded
     return rec_obj
@@ -33,51 +33,44 @@ class Ascii(datatypes.DataType):
     """ Encode either a string or a list of strings to ASCII data. The
     is_big_endian parameter is only here for compatibility reasons. """
     
-    # If the user passed a string, put it in a list for easier handling
-    if (type(streams) == types.StringType):
-      streams = [streams]
+    # If the user passed a single string, we only need to cap it
+    if (isinstance(streams, str)):
+      return streams + "\x00"
       
-    # Iterate over the strings and put a null character at each end
-    byte_stream = ""
-    for stream in streams:
-      byte_stream += stream + "\x00"
-      
-    return byte_stream
+    # Otherwise, put a null character at the end of each string
+    return "".join([stream + "\x00" for stream in streams])
     
   @classmethod
   def decode(cls, byte_stream, is_big_endian = True):
     """ Convert a byte stream to a list of strings. The is_big_endian parameter
         is only here for compatibility reasons. """
         
-    streams = []
-    curr_stream = ""
-    
-    # Iterate over all the characters in the byte stream, and start a new string
-    # at every null character
-    for char in byte_stream:
-      if (char == "\x00"):
-        if (len(curr_stream) > 0):
-          streams.append(curr_stream)
-        curr_stream = ""
-      else:
-        curr_stream += char
+    # Split the byte stream at every null character. The last part is not
+    # terminated by a null character, so it is not a complete string. Empty
+    # strings are skipped.
+    streams = byte_stream.split("\x00")[:-1]
 
-    return streams
+    return [stream for stream in streams if stream]
     
-DATA_TYPES = {
-  1: datatypes.Byte,
-  2: Ascii,
-  3: datatypes.Short,
-  4: datatypes.Long,
-  5: datatypes.Rational,
-  6: datatypes.SByte,
-  7: datatypes.Undefined,
-  8: datatypes.SShort,
-  9: datatypes.SLong,
-  10: datatypes.SRational,
-  11: datatypes.Float,
-  12: datatypes.Double
-} 
+# The data type classes, indexed by their number. The numbers run from 1 to 12,
+# so a tuple is cheaper to look up than a dict. Code in this module should
+# prefer it over the DATA_TYPES dict, which is kept for the metainfo classes.
+DATA_TYPES_BY_NUM = (
+  None,
+  datatypes.Byte,
+  Ascii,
+  datatypes.Short,
+  datatypes.Long,
+  datatypes.Rational,
+  datatypes.SByte,
+  datatypes.Undefined,
+  datatypes.SShort,
+  datatypes.SLong,
+  datatypes.SRational,
+  datatypes.Float,
+  datatypes.Double
+)
+DATA_TYPES = dict([(num, DATA_TYPES_BY_NUM[num]) for num in range(1, len(DATA_TYPES_BY_NUM))])
 
 # === Stuff relating to the IFD structure ===
 class Tag(datablock.DataBlock):
@@ -161,10 +154,15 @@ class IFD(metainfofile.MetaInfoRecord):
         data_type   = byteform.btousi(self.read(2), big_endian = self.big_endian)
         payload_len = byteform.btousi(self.read(4), big_endian = self.big_endian)
   
+        # Check that we know the data type, so that all further lookups of it
+        # are safe
+        if (data_type < 1) or (data_type >= len(DATA_TYPES_BY_NUM)):
+          raise KeyError("Unknown data type %d for tag %d!" % (data_type, tag_type))
+          
         # The word width (number of bytes to encode one "character") of the
         # payload is determined by the data type. This needs to be multiplied by
         # the number of characters to get the total number of bytes.
-        num_bytes = payload_len * DATA_TYPES[data_type].word_width
+        num_bytes = payload_len * DATA_TYPES_BY_NUM[data_type].word_width
           
         # The next four bytes either encode an offset te where the payload can
         # be found, or the payload itself if it fits in these four bytes. We
@@ -194,7 +192,7 @@ class IFD(metainfofile.MetaInfoRecord):
     # Decipher the relevant info
     data_type = tag.getDataType()
     data      = tag.getData()
-    payload   = self.DATA_TYPES[data_type].decode(data, self.big_endian)
+    payload   = DATA_TYPES_BY_NUM[data_type].decode(data, self.big_endian)
 
     # If the tag is empty, return None. Else if data is a single value, return 
     # it as such, otherwise, return a list
@@ -255,7 +253,7 @@ class IFD(metainfofile.MetaInfoRecord):
       success = False
       for data_type in data_types:
         try:
-          data = DATA_TYPES[data_type].encode(payload, self.big_endian)
+          data = DATA_TYPES_BY_NUM[data_type].encode(payload, self.big_endian)
           success = True
         except:
           pass
@@ -338,7 +336,7 @@ class IFD(metainfofile.MetaInfoRecord):
         tag       = self.fields[tag_num]
         data_type = tag.getDataType()
         data      = tag.getData()
-        count     = len(data) / DATA_TYPES[data_type].word_width
+        count     = len(data) / DATA_TYPES_BY_NUM[data_type].word_width
         
         # Write the tag number, data type and data count
         fields_stream += byteform.itob(tag_num, 2, big_endian = self.big_endian)
@@ -93,7 +93,10 @@ class IPTC(metainfofile.MetaInfoBlock, datablock.DataBlock):
     if (not self.parsed):
       self.parse()
     
-    return self.records.query("num", rec_num, "record")
+    index = self.__getRecordIndex__(rec_num)
+    if (index == None):
+      return False
+    return self.records.getList("record")[index]
 
   def parse(self):
     """ Parse the IPTC block. """
@@ -126,7 +129,7 @@ class IPTC(metainfofile.MetaInfoBlock, datablock.DataBlock):
 
       # Construct the tag and append it to the list
       tag_obj = datablock.DataBlock(self.fp, self.tell() + self.getDataOffset(), length)
-      record = self.records.query("num", record_num, "record")
+      record = self.records.getList("record")[self.__getRecordIndex__(record_num)]
       if (tag_type in record.fields):
         record.fields[tag_type].append(tag_obj)
       else:
@@ -158,4 +161,4 @@ class IPTC(metainfofile.MetaInfoBlock, datablock.DataBlock):
   
     rec_num, tag_num = self.__getRecordAndTagNum__(tag)
     if (rec_num):
-      self.records.query("num", rec_num, "record").appendTag(tag_num, payload)
+      self.getRecord(rec_num).appendTag(tag_num, payload)
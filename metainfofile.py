@@ -17,7 +17,10 @@
 # Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
 # 
 
-import byteform, datablock, qdb, types, shutil
+import byteform, datablock, qdb, shutil
+
+# The Python types which are accepted as tag or record numbers
+INTEGER_TYPES = (int, long)
    
 class MetaInfoBlock:
   """ The base class for a particuler kind of metainformation structure, like
@@ -37,7 +40,19 @@ class MetaInfoBlock:
       Furthermore, it should have a dict called DATA_TYPES, where the keys
       are the number of each data type, and the values a class to manipulate
       that particular kind of data.
+      The numbers and names of the records should not change after they have
+      been set, since their position in the QDB is cached.
   """
+  
+  # The index of each record in the records QDB, by number and by name. They
+  # are built when first needed.
+  record_indices      = None
+  record_name_indices = None
+  
+  # For each record number, a dict mapping the tag numbers and names of the
+  # record to the tag number, or None if the record could not be loaded. A
+  # record is added when it is first needed.
+  record_tags = None
       
   def getTag(self, tag, record = None, data_type = None):
     """ Return the tag data with the specified number from the specified record.
@@ -51,11 +66,11 @@ class MetaInfoBlock:
     except KeyError:
       # We're dealing with an unknown tag, but it may have been loaded from disk
       if (record):
-        if (type(tag) == types.IntType):
+        if (isinstance(tag, INTEGER_TYPES)):
           tag_num = tag
           record_num = self.__getRecordNum__(record)
       if (tag_num == None) or (record_num == None):
-        raise TypeError, "Unknown tag %s, please specify tag number and record number" % str(tag)
+        raise TypeError("Unknown tag %s, please specify tag number and record number" % str(tag))
         
     # Get the data
     if (record_num):
@@ -86,18 +101,19 @@ class MetaInfoBlock:
     # set it
     except KeyError:
       if not (record):
-        raise "Unknown tag %s, record needed" % str(tag)
+        raise KeyError("Unknown tag %s, record needed" % str(tag))
       else:
         rec_num = self.__getRecordNum__(record)
 
-      if (type(tag) in [types.IntType, types.LongType]):
+      if (isinstance(tag, INTEGER_TYPES)):
         tag_num = tag
       else:
-        raise TypeError, "Unknown tag %s, needs to be specified as a number" % str(tag)
+        raise TypeError("Unknown tag %s, needs to be specified as a number" % str(tag))
 
     # Set the data.
     if (rec_num):
       self.getRecord(rec_num).setTag(tag_num, payload, check, data_type, data_count, data)
+      self.__forgetMissingRecords__()
   
   def removeTag(self, tag, record = None):
     """ Remove the tag with the specified name or number from the strucrure. """
@@ -109,68 +125,123 @@ class MetaInfoBlock:
       record = self.getRecord(rec_num)
       if (record):
         record.removeTag(tag_num)
+        self.__forgetMissingRecords__()
     
   def hasTags(self):
     """ Returns True of the structure has any tags set, or False otherwise. """
 
-    # Loop over each record (load it if needed) and return True if one of them
-    # has tags set.
-    for rec_num in self.records.getList("num"):
-      record = self.getRecord(rec_num)
-      if (record and record.hasTags()):
-        return True
-     
-    return False
+    # Loop over each record (load it if needed) and return True as soon as one
+    # of them has tags set.
+    records = (self.getRecord(rec_num) for rec_num in self.records.getList("num"))
+    return any(record and record.hasTags() for record in records)
 
   def __getRecordNum__(self, record):
     """ Return the record number based on a record number or name. """
     
     # Test numerical input
-    if (type(record) == types.IntType):
-      if record in self.records.getList("num"):
+    if (isinstance(record, INTEGER_TYPES)):
+      if (self.__getRecordIndex__(record) != None):
         return record
       else:
-        raise ValueError, "Unknown record %d!" % record
+        raise ValueError("Unknown record %d!" % record)
     # Test text input
-    elif (type(record) == types.StringType):
-      index = self.records.query("name", record)
-      if (index):
-        return self.records.query(index, "num")
+    elif (isinstance(record, str)):
+      index = self.__getRecordNameIndex__(record)
+      if (index != None):
+        return self.records.getList("num")[index]
       else:
-        raise ValueError, "Unknown record %s!" % record
+        raise ValueError("Unknown record %s!" % record)
     else:
-      raise TypeError, "I can't make sense of an record of type %s!" % type(record)
+      raise TypeError("I can't make sense of an record of type %s!" % type(record))
 
+  def __getRecordIndex__(self, rec_num):
+    """ Return the index in the records QDB of the record with the specified
+        number, or None if there is no such record. """
+    
+    # Map the record numbers to their index on the first call, so we don't
+    # have to search through the QDB each time.
+    if (self.record_indices == None):
+      self.record_indices = {}
+      for index, num in enumerate(self.records.getList("num")):
+        self.record_indices[num] = index
+        
+    return self.record_indices.get(rec_num)
+    
+  def __getRecordNameIndex__(self, rec_name):
+    """ Return the index in the records QDB of the record with the specified
+        name, or None if there is no such record. """
+    
+    if (self.record_name_indices == None):
+      self.record_name_indices = {}
+      for index, name in enumerate(self.records.getList("name")):
+        self.record_name_indices[name] = index
+        
+    return self.record_name_indices.get(rec_name)
+    
   def __getRecordAndTagNum__(self, tag, record = None):
     """ Return the record number and tag number for the supplied tag (name or
         number) in the specified record (name or number). If record is omitted,
         the method will search in all records and raise an error if
         ambiguousnesses are found. """
       
+    # Check the input type
+    if (not isinstance(tag, INTEGER_TYPES)) and (not isinstance(tag, str)):
+      raise TypeError("Incorrect input type for finding tag numbers.")
+      
     # If the user didn't specify a record, we search through all records
     if (record == None):
-      records = self.records.getList("num")
+      rec_nums = self.records.getList("num")
     # Otherwise, we need to have a record number
     else:
-      records = [self.__getRecordNum__(record)]
-
+      rec_nums = [self.__getRecordNum__(record)]
+      
     # Find the possible records
     found_records = []
-    for rec_num in records:
-      record = self.getRecord(rec_num)
-      if (record):
-        tag_num = self.getRecord(rec_num).getTagNum(tag)
-        if (tag_num is not False):
-          found_records.append([rec_num, tag_num])
+    for rec_num in rec_nums:
+      record_tags = self.__getRecordTags__(rec_num)
+      if (record_tags) and (tag in record_tags):
+        found_records.append([rec_num, record_tags[tag]])
 
     # Warn if the tag occurs in multiple records
     if (len(found_records) == 0):
-      raise KeyError, "Tag %s is unknown!" % str(tag)
+      raise KeyError("Tag %s is unknown!" % str(tag))
     elif (len(found_records) > 1):
-      raise "Tag %s occurs in multiple records!" % str(tag)
+      raise ValueError("Tag %s occurs in multiple records!" % str(tag))
       
     return found_records[0]
 
+  def __getRecordTags__(self, rec_num):
+    """ Return a dict which maps the tag numbers and names of the specified
+        record to the tag number, or None if the record can't be loaded. The
+        record is only loaded and indexed the first time it is needed. """
+        
+    if (self.record_tags == None):
+      self.record_tags = {}
+      
+    if (rec_num not in self.record_tags):
+      record_tags = None
+      record = self.getRecord(rec_num)
+      if (record):
+        record_tags = {}
+        tag_names = record.tags.getList("name")
+        tag_nums  = record.tags.getList("num")
+        for tag_name, tag_num in zip(tag_names, tag_nums):
+          record_tags[tag_num]  = tag_num
+          record_tags[tag_name] = tag_num
+      self.record_tags[rec_num] = record_tags
+      
+    return self.record_tags[rec_num]
+    
+  def __forgetMissingRecords__(self):
+    """ Forget which records could not be loaded, so they are tried again. A
+        record may become available after a tag has changed, like the Exif
+        makernote after the camera make is set. """
+        
+    if (self.record_tags != None):
+      for rec_num, record_tags in self.record_tags.items():
+        if (record_tags == None):
+          del self.record_tags[rec_num]
+
 class MetaInfoRecord(datablock.DataBlock):
   """ Base class for a metainformation record (like an IFD or an IPTC record). 
       Derived classes should hold create a QDB with the folowing lists:
@@ -197,28 +268,26 @@ class MetaInfoRecord(datablock.DataBlock):
     tag_num = False
     
     # Try numeric input
-    if (type(tag) == types.IntType):
+    if (isinstance(tag, INTEGER_TYPES)):
       if (self.tags.query("num", tag) is not False):
         tag_num = tag
     # Try text input
-    elif (type(tag) == types.StringType):
+    elif (isinstance(tag, str)):
       tag_num = self.tags.query("name", tag, "num")
     else:
-      raise TypeError, "Incorrect input type for finding tag numbers."
+      raise TypeError("Incorrect input type for finding tag numbers.")
       
     return tag_num
 
   def getTagNums(self):
     """ Return a sorted list of set tag nums in this record. """
     
-    tag_nums = self.fields.keys()
-    tag_nums.sort()
-    return tag_nums
+    return sorted(self.fields)
     
   def hasTags(self):
     """ Return True if the record has any tags set, or False if not. """
     
-    return (len(self.fields) > 0)
+    return bool(self.fields)
 
 # Only import these here, as the need to have MetaInfoRecord loaded first
 import exif, iptc